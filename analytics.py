@@ -0,0 +1,239 @@
+from models import db, Doctor, DoctorSchedule, Appointment
+from models.branch import current_branch
+from datetime import datetime, timedelta
+import numpy as np
+
+# Stats for weeks that have fully ended never change, so they are kept here
+# keyed by branch and the Monday that starts the week.
+_closed_week_cache = {}
+
+
+def week_start(day):
+    """Return the Monday of the week containing the given date"""
+    return day - timedelta(days=day.weekday())
+
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+
+def load_schedule_arrays():
+    """Pull every doctor and schedule row into columnar arrays.
+
+    Returns (doctor_ids, weekly_offered, created_days) where doctor_ids is
+    sorted and the other arrays are aligned with it.
+    """
+    doctor_rows = db.session.query(Doctor.id, Doctor.created_at).order_by(Doctor.id).all()
+    if not doctor_rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype='datetime64[D]')
+
+    ids, created = zip(*doctor_rows)
+    doctor_ids = np.array(ids, dtype=np.int64)
+    created_days = np.array([c.date() if c else datetime.min.date() for c in created],
+                            dtype='datetime64[D]')
+
+    weekly_offered = np.zeros(len(doctor_ids), dtype=np.int64)
+    schedule_rows = db.session.query(DoctorSchedule.doctor_id,
+                                     DoctorSchedule.start_time,
+                                     DoctorSchedule.end_time,
+                                     DoctorSchedule.slot_duration).all()
+    if schedule_rows:
+        sched_doctor, starts, ends, durations = zip(*schedule_rows)
+        start_min = np.fromiter((_minutes(t) for t in starts), dtype=np.int64, count=len(starts))
+        end_min = np.fromiter((_minutes(t) for t in ends), dtype=np.int64, count=len(ends))
+        duration = np.array([d or 30 for d in durations], dtype=np.int64)
+        # Slots start while current_time < end_time, matching get_available_slots
+        slots_per_day = np.maximum(-(-(end_min - start_min) // duration), 0)
+        sched_doctor = np.array(sched_doctor, dtype=np.int64)
+        idx = np.searchsorted(doctor_ids, sched_doctor)
+        # Schedules of doctors that no longer exist cannot be attributed
+        known = idx < len(doctor_ids)
+        known[known] = doctor_ids[idx[known]] == sched_doctor[known]
+        np.add.at(weekly_offered, idx[known], slots_per_day[known])
+
+    return doctor_ids, weekly_offered, created_days
+
+
+def load_appointment_arrays(start, end):
+    """Pull appointments dated in [start, end) into columnar arrays"""
+    rows = db.session.query(Appointment.doctor_id,
+                            Appointment.appointment_date,
+                            Appointment.appointment_time,
+                            Appointment.status).filter(
+        Appointment.appointment_date >= start,
+        Appointment.appointment_date < end
+    ).all()
+    if not rows:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype='datetime64[D]'),
+                np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool))
+
+    doctor_col, date_col, time_col, status_col = zip(*rows)
+    return (np.array(doctor_col, dtype=np.int64),
+            np.array(date_col, dtype='datetime64[D]'),
+            np.fromiter((t.hour for t in time_col), dtype=np.int64, count=len(time_col)),
+            np.array(status_col) == 'cancelled')
+
+
+def compute_weekly_stats(weeks):
+    """Compute per-doctor stats for a contiguous run of weeks in one pass.
+
+    Returns a dict mapping each week's Monday to a dict of arrays aligned
+    with its doctor_ids: offered, booked, cancelled, plus a 24-bin hours
+    histogram of booked appointments.
+    """
+    if not weeks:
+        return {}
+
+    doctor_ids, weekly_offered, created_days = load_schedule_arrays()
+    first = weeks[0]
+    n_weeks = len(weeks)
+    n_doctors = len(doctor_ids)
+
+    appt_doctor, appt_date, appt_hour, appt_cancelled = load_appointment_arrays(
+        first, first + timedelta(weeks=n_weeks))
+
+    week_idx = (appt_date - np.datetime64(first, 'D')).astype(np.int64) // 7
+
+    # Appointments of doctors that no longer exist cannot be attributed
+    doctor_idx = np.searchsorted(doctor_ids, appt_doctor)
+    known = doctor_idx < n_doctors
+    known[known] = doctor_ids[doctor_idx[known]] == appt_doctor[known]
+
+    booked_mask = known & ~appt_cancelled
+    cancelled_mask = known & appt_cancelled
+    cell = doctor_idx * n_weeks + week_idx
+    size = n_doctors * n_weeks
+    booked = np.bincount(cell[booked_mask], minlength=size).reshape(n_doctors, n_weeks)
+    cancelled = np.bincount(cell[cancelled_mask], minlength=size).reshape(n_doctors, n_weeks)
+    hours = np.bincount(week_idx[booked_mask] * 24 + appt_hour[booked_mask],
+                        minlength=n_weeks * 24).reshape(n_weeks, 24)
+
+    # A doctor only offers slots from the week they were added onwards
+    week_ends = np.datetime64(first, 'D') + np.arange(1, n_weeks + 1) * 7
+    active = created_days[:, None] < week_ends[None, :]
+    offered = weekly_offered[:, None] * active
+
+    return {
+        week: {
+            'doctor_ids': doctor_ids,
+            'offered': offered[:, w],
+            'booked': booked[:, w],
+            'cancelled': cancelled[:, w],
+            'hours': hours[w],
+        }
+        for w, week in enumerate(weeks)
+    }
+
+
+def get_weekly_stats(start, end, today=None):
+    """Return stats for every week overlapping [start, end], using the cache
+    for weeks that have already closed"""
+    today = today or datetime.now().date()
+    current_week = week_start(today)
+    weeks = []
+    week = week_start(start)
+    while week <= end:
+        weeks.append(week)
+        week += timedelta(weeks=1)
+
+    branch = current_branch()
+    missing = [w for w in weeks if (branch, w) not in _closed_week_cache]
+    fresh = {}
+    if missing:
+        # One bulk load covering the whole span of uncached weeks
+        span = []
+        week = missing[0]
+        while week <= missing[-1]:
+            span.append(week)
+            week += timedelta(weeks=1)
+        fresh = compute_weekly_stats(span)
+        for week, stats in fresh.items():
+            if week < current_week:
+                _closed_week_cache[(branch, week)] = stats
+
+    return {w: _closed_week_cache.get((branch, w)) or fresh[w] for w in weeks}
+
+
+def clear_cache():
+    _closed_week_cache.clear()
+
+
+def _week_row(week, offered, booked, cancelled):
+    return {
+        'week_start': week,
+        'offered': offered,
+        'booked': booked,
+        'cancelled': cancelled,
+        'utilisation': booked / offered if offered else 0.0,
+        'cancellation_rate': cancelled / (booked + cancelled) if booked + cancelled else 0.0,
+    }
+
+
+def _peak_hours(hours):
+    return [int(h) for h in np.argsort(hours)[::-1][:3] if hours[h] > 0]
+
+
+def utilisation_report(start, end, today=None):
+    """Aggregate weekly stats into per-doctor, per-week and peak-hour summaries"""
+    weekly = get_weekly_stats(start, end, today=today)
+    weeks = sorted(weekly)
+
+    # Cached weeks may predate newly added doctors, so align on the union
+    doctor_ids = np.unique(np.concatenate([s['doctor_ids'] for s in weekly.values()]))
+    n_doctors = len(doctor_ids)
+    offered = np.zeros(n_doctors, dtype=np.int64)
+    booked = np.zeros(n_doctors, dtype=np.int64)
+    cancelled = np.zeros(n_doctors, dtype=np.int64)
+    hours = np.zeros(24, dtype=np.int64)
+    week_rows = []
+
+    for week in weeks:
+        stats = weekly[week]
+        idx = np.searchsorted(doctor_ids, stats['doctor_ids'])
+        offered[idx] += stats['offered']
+        booked[idx] += stats['booked']
+        cancelled[idx] += stats['cancelled']
+        hours += stats['hours']
+
+        week_rows.append(_week_row(week,
+                                   int(stats['offered'].sum()),
+                                   int(stats['booked'].sum()),
+                                   int(stats['cancelled'].sum())))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilisation = np.where(offered > 0, booked / offered, 0.0)
+        total = booked + cancelled
+        cancellation_rate = np.where(total > 0, cancelled / total, 0.0)
+
+    return {
+        'weeks': week_rows,
+        'doctor_ids': doctor_ids,
+        'offered': offered,
+        'booked': booked,
+        'cancelled': cancelled,
+        'utilisation': utilisation,
+        'cancellation_rate': cancellation_rate,
+        'hours': hours,
+        'peak_hours': _peak_hours(hours),
+    }
+
+
+def merge_reports(reports):
+    """Combine utilisation_report results for the same weeks across branches"""
+    reports = list(reports)
+    hours = sum((r['hours'] for r in reports), np.zeros(24, dtype=np.int64))
+    week_rows = []
+    for rows in zip(*(r['weeks'] for r in reports)):
+        week_rows.append(_week_row(rows[0]['week_start'],
+                                   sum(row['offered'] for row in rows),
+                                   sum(row['booked'] for row in rows),
+                                   sum(row['cancelled'] for row in rows)))
+    return {
+        'weeks': week_rows,
+        'hours': hours,
+        'peak_hours': _peak_hours(hours),
+        'total_offered': sum(int(r['offered'].sum()) for r in reports),
+        'total_booked': sum(int(r['booked'].sum()) for r in reports),
+        'total_cancelled': sum(int(r['cancelled'].sum()) for r in reports),
+    }
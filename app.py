@@ -1,7 +1,8 @@
-from flask import Flask, redirect, url_for
+from flask import Flask, redirect, url_for, session, g
 from flask_login import LoginManager, current_user
 from config import config
 from models import db, User
+from models.branch import create_all_branches, migrate_unbranched_data, run_in_branch, current_branch
 from routes import auth_bp, patient_bp, admin_bp
 from routes import patient_bp
 import os
@@ -15,6 +16,7 @@ def create_app(config_name=None):
         config_name = os.environ.get('FLASK_ENV', 'development')
     
     app.config.from_object(config[config_name])
+    config[config_name].init_app(app)
     
     # Initialize extensions
     db.init_app(app)
@@ -30,6 +32,22 @@ def create_app(config_name=None):
     def load_user(user_id):
         return User.query.get(int(user_id))
     
+    # Bind every request to the branch picked by the user
+    @app.before_request
+    def bind_branch():
+        branch = session.get('branch')
+        g.branch = branch if branch in app.config['BRANCHES'] else app.config['BRANCHES'][0]
+
+    # Branch-scoped URLs default to the current branch when building links
+    @app.url_defaults
+    def add_branch(endpoint, values):
+        if 'branch' not in values and app.url_map.is_endpoint_expecting(endpoint, 'branch'):
+            values['branch'] = current_branch()
+
+    @app.context_processor
+    def inject_branches():
+        return {'branches': app.config['BRANCHES'], 'current_branch': g.get('branch')}
+
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(patient_bp)
@@ -37,16 +55,19 @@ def create_app(config_name=None):
     
     # Create tables and sample data
     with app.app_context():
-        db.create_all()
+        # Plain db.create_all() fails on the shared 'branch' bind key, see create_all_branches
+        db.create_all(bind_key=None)
+        create_all_branches(db)
+        migrate_unbranched_data(db)
         create_sample_data()
+        for branch in app.config['BRANCHES']:
+            run_in_branch(branch, create_branch_sample_data, app)
     
     return app
 
 def create_sample_data():
-    """Create sample data if database is empty"""
+    """Create sample users if database is empty"""
     from werkzeug.security import generate_password_hash
-    from models import User, Doctor, DoctorSchedule
-    from datetime import time
     
     # Check if data already exists
     if User.query.first():
@@ -71,6 +92,15 @@ def create_sample_data():
         phone='0987654321'
     )
     db.session.add(patient)
+    db.session.commit()
+
+def create_branch_sample_data():
+    """Create sample doctors in the current branch if it is empty"""
+    from models import Doctor, DoctorSchedule
+    from datetime import time
+    
+    if Doctor.query.first():
+        return
     
     # Create sample doctors
     doctors_ = [
@@ -133,7 +163,7 @@ def create_sample_data():
             db.session.add(schedule)
     
     db.session.commit()
-    print("Sample data created successfully!")
+    print(f"Sample data created successfully for branch {g.branch}!")
 
 if __name__ == '__main__':
     app = create_app()
@@ -1,18 +1,58 @@
 import os
 from datetime import timedelta
 
+
+def branch_names(default):
+    names = os.environ.get('HOSPITAL_BRANCHES') or default
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+def branch_binds(branches, prefix=None, default_uri=None):
+    """One database per branch, set with <BRANCH>_DATABASE_URL.
+
+    If default_uri is given the first branch shares that database. Other
+    branches fall back to a <prefix>_<name>.db SQLite file, or to None when
+    no prefix is given so init_app can reject the configuration.
+    """
+    binds = {}
+    for i, name in enumerate(branches):
+        if i == 0 and default_uri:
+            fallback = default_uri
+        else:
+            fallback = f'sqlite:///{prefix}_{name}.db' if prefix else None
+        binds[f'branch:{name}'] = os.environ.get(f'{name.upper()}_DATABASE_URL') or fallback
+    return binds
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'hospital-booking-secret-key-2025'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
 
+    @classmethod
+    def init_app(cls, app):
+        pass
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or 'sqlite:///hospital_dev.db'
+    BRANCHES = branch_names('central,north')
+    SQLALCHEMY_BINDS = branch_binds(BRANCHES, 'hospital_dev')
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///hospital.db'
+    BRANCHES = branch_names('main')
+    # No local SQLite fallback: every branch after the first needs its own URL
+    SQLALCHEMY_BINDS = branch_binds(BRANCHES, default_uri=SQLALCHEMY_DATABASE_URI)
+
+    @classmethod
+    def init_app(cls, app):
+        missing = [key.split(':', 1)[1] for key, uri in cls.SQLALCHEMY_BINDS.items() if not uri]
+        if missing:
+            raise RuntimeError('No database configured for branch(es): '
+                               + ', '.join(f'{name} (set {name.upper()}_DATABASE_URL)'
+                                           for name in missing))
 
 config = {
     'development': DevelopmentConfig,
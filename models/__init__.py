@@ -1,8 +1,9 @@
 # models/__init__.py
 from flask_sqlalchemy import SQLAlchemy
+from .branch import BranchRoutingSession
 
 # Yeh db instance COMMON hai sabke liye
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': BranchRoutingSession})
 
 # Import all models so they're registered
 from .user import User
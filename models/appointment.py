@@ -1,9 +1,21 @@
 from . import db
+from .branch import BRANCH_BIND_KEY, current_branch
 from datetime import datetime
 
 class Appointment(db.Model):
+    __bind_key__ = BRANCH_BIND_KEY
+    __table_args__ = (
+        # A slot can only hold one scheduled appointment; cancelled rows don't count
+        db.Index('uq_appointment_scheduled_slot', 'doctor_id', 'appointment_date', 'appointment_time',
+                 unique=True,
+                 sqlite_where=db.text("status = 'scheduled'"),
+                 postgresql_where=db.text("status = 'scheduled'")),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    branch = db.Column(db.String(50), nullable=False, default=current_branch, index=True)
+    # Users live in the shared database, so this cannot be a real foreign key
+    patient_id = db.Column(db.Integer, nullable=False, index=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
     appointment_date = db.Column(db.Date, nullable=False)
     appointment_time = db.Column(db.Time, nullable=False)
@@ -0,0 +1,169 @@
+# models/branch.py
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from flask_sqlalchemy.pagination import Pagination
+from concurrent.futures import ThreadPoolExecutor
+import sqlalchemy as sa
+import sqlalchemy.exc as sa_exc
+from sqlalchemy.sql.util import find_tables
+
+# Models with this bind key live in one database per hospital branch
+BRANCH_BIND_KEY = 'branch'
+# Parents first, so copied rows satisfy foreign keys
+BRANCH_TABLE_ORDER = ('doctor', 'doctor_schedule', 'appointment')
+# Pre-branch tables are kept under this suffix once copied into a branch
+LEGACY_TABLE_SUFFIX = '_pre_branch'
+
+
+def branch_bind_key(branch):
+    return f'{BRANCH_BIND_KEY}:{branch}'
+
+
+def get_branches():
+    return current_app.config['BRANCHES']
+
+
+def current_branch():
+    """Branch the current app context is bound to, or the default branch"""
+    if has_app_context():
+        return g.get('branch') or get_branches()[0]
+    return None
+
+
+def _is_branch_table(table):
+    return (isinstance(table, sa.Table)
+            and table.metadata.info.get('bind_key') == BRANCH_BIND_KEY)
+
+
+class BranchRoutingSession(Session):
+    """Session that sends branch models to the current branch's database"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            tables = []
+            if mapper is not None:
+                try:
+                    tables.append(sa.inspect(mapper).local_table)
+                except sa_exc.NoInspectionAvailable:
+                    pass
+            if clause is not None:
+                # Core insert/update/select statements carry no mapper, so
+                # look through everything the statement touches
+                tables.extend(find_tables(clause, check_columns=True, include_crud=True))
+
+            if any(_is_branch_table(table) for table in tables):
+                return self._db.engines[branch_bind_key(current_branch())]
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def create_all_branches(db, branches=None):
+    """Create the branch tables in every branch database.
+
+    db.create_all() / db.drop_all() with the default bind_key='__all__'
+    raise UnboundExecutionError, because the shared 'branch' bind key has
+    no single engine in SQLALCHEMY_BINDS. Call them with bind_key=None for
+    the shared database and use these helpers for the branch databases.
+    """
+    metadata = db.metadatas[BRANCH_BIND_KEY]
+    for branch in branches or get_branches():
+        metadata.create_all(bind=db.engines[branch_bind_key(branch)])
+
+
+def drop_all_branches(db, branches=None):
+    """Drop the branch tables from every branch database"""
+    metadata = db.metadatas[BRANCH_BIND_KEY]
+    for branch in branches or get_branches():
+        metadata.drop_all(bind=db.engines[branch_bind_key(branch)])
+
+
+def migrate_unbranched_data(db, branch=None):
+    """Move doctor, schedule and appointment rows that predate branches into
+    the default branch, tagging them with its name.
+
+    If the branch shares the main database the existing tables get a branch
+    column in place. Otherwise the rows are copied, keeping their ids, into
+    the branch tables if they are still empty, and the originals are renamed
+    with LEGACY_TABLE_SUFFIX. Safe to run on every start.
+    """
+    branch = branch or get_branches()[0]
+    source = db.engines[None]
+    target = db.engines[branch_bind_key(branch)]
+    metadata = db.metadatas[BRANCH_BIND_KEY]
+
+    inspector = sa.inspect(source)
+    legacy = [name for name in BRANCH_TABLE_ORDER
+              if inspector.has_table(name)
+              and 'branch' not in {c['name'] for c in inspector.get_columns(name)}]
+    if not legacy:
+        return
+
+    if source.url == target.url:
+        with source.begin() as conn:
+            for name in legacy:
+                conn.execute(sa.text(f"ALTER TABLE {name} ADD COLUMN branch VARCHAR(50) "
+                                     f"NOT NULL DEFAULT '{branch}'"))
+                for index in metadata.tables[name].indexes:
+                    try:
+                        with conn.begin_nested():
+                            index.create(conn, checkfirst=True)
+                    except sa_exc.IntegrityError:
+                        print(f"Could not create {index.name}: duplicate rows in {name}")
+        print(f"Added branch column for branch {branch} to: {', '.join(legacy)}")
+        return
+
+    with target.connect() as conn:
+        occupied = [name for name in legacy if conn.execute(
+            sa.select(sa.func.count()).select_from(metadata.tables[name])).scalar()]
+    if occupied:
+        print(f"Not copying pre-branch rows: branch {branch} already has rows in "
+              f"{', '.join(occupied)}")
+        return
+
+    with source.connect() as src, target.begin() as dst:
+        for name in legacy:
+            table = metadata.tables[name]
+            old_table = sa.Table(name, sa.MetaData(), autoload_with=src)
+            rows = [{**{k: v for k, v in row.items() if k in table.c}, 'branch': branch}
+                    for row in src.execute(sa.select(old_table)).mappings()]
+            if rows:
+                dst.execute(table.insert(), rows)
+            print(f"Copied {len(rows)} {name} rows into branch {branch}")
+
+    # Rename the originals so the copy never runs again, e.g. after the
+    # branch list is reordered or a branch deletes its doctors
+    with source.begin() as conn:
+        for name in legacy:
+            conn.execute(sa.text(f"ALTER TABLE {name} RENAME TO {name}{LEGACY_TABLE_SUFFIX}"))
+    print(f"Renamed pre-branch tables to *{LEGACY_TABLE_SUFFIX}")
+
+
+def run_in_branch(branch, func, app=None):
+    """Call func inside a fresh app context bound to the given branch"""
+    app = app or current_app._get_current_object()
+    with app.app_context():
+        g.branch = branch
+        return func()
+
+
+def fan_out(func, branches=None):
+    """Run func against every branch in parallel, returning {branch: result}.
+
+    Each branch gets its own app context and therefore its own session, so
+    anything the template needs must be loaded before func returns.
+    """
+    app = current_app._get_current_object()
+    branches = branches or get_branches()
+    with ThreadPoolExecutor(max_workers=len(branches)) as executor:
+        futures = {b: executor.submit(run_in_branch, b, func, app) for b in branches}
+        return {b: future.result() for b, future in futures.items()}
+
+
+class MergedPagination(Pagination):
+    """Pagination over a page of items already merged from several branches"""
+
+    def _query_items(self):
+        return self._query_args['items']
+
+    def _query_count(self):
+        return self._query_args['total']
@@ -1,9 +1,13 @@
 # models/doctor.py
 from . import db
+from .branch import BRANCH_BIND_KEY, current_branch
 from datetime import datetime
 
 class Doctor(db.Model):
+    __bind_key__ = BRANCH_BIND_KEY
+
     id = db.Column(db.Integer, primary_key=True)
+    branch = db.Column(db.String(50), nullable=False, default=current_branch, index=True)
     name = db.Column(db.String(100), nullable=False)
     specialization = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120))
@@ -21,7 +25,10 @@ class Doctor(db.Model):
         return f'<Doctor {self.name}>'
 
 class DoctorSchedule(db.Model):
+    __bind_key__ = BRANCH_BIND_KEY
+
     id = db.Column(db.Integer, primary_key=True)
+    branch = db.Column(db.String(50), nullable=False, default=current_branch, index=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
     day_of_week = db.Column(db.Integer, nullable=False)  # 0=Monday, 6=Sunday
     start_time = db.Column(db.Time, nullable=False)
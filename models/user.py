@@ -12,7 +12,8 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    appointments = db.relationship('Appointment', backref='patient', lazy=True)
+    appointments = db.relationship('Appointment', backref='patient', lazy=True,
+                                   primaryjoin='User.id == foreign(Appointment.patient_id)')
     
     def __repr__(self):
         return f'<User {self.username}>'
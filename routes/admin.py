@@ -2,8 +2,14 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from functools import wraps
 from models import Doctor, Appointment, User, DoctorSchedule, db
-from datetime import datetime, time
+from models.branch import fan_out, MergedPagination, current_branch
+from .branch import branch_scoped
+from datetime import datetime, time, timedelta
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from collections import Counter
+import numpy as np
+import analytics
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -16,46 +22,59 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _branch_dashboard_stats():
+    """Dashboard numbers for the branch bound to the current app context"""
+    today = datetime.now().date()
+    this_month = datetime.now().replace(day=1).date()
+    
+    popular_specs = db.session.query(
+        Doctor.specialization,
+        func.count(Appointment.id).label('count')
+    ).join(Appointment).group_by(Doctor.specialization).all()
+    
+    return {
+        'total_doctors': Doctor.query.filter_by(is_available=True).count(),
+        'today_appointments': Appointment.query.filter_by(
+            appointment_date=today,
+            status='scheduled'
+        ).count(),
+        'monthly_appointments': Appointment.query.filter(
+            Appointment.appointment_date >= this_month
+        ).count(),
+        # Loaded eagerly since the branch session is gone once we return
+        'recent_appointments': Appointment.query.options(
+            joinedload(Appointment.doctor),
+            selectinload(Appointment.patient)
+        ).order_by(Appointment.created_at.desc()).limit(10).all(),
+        'popular_specs': [(spec, count) for spec, count in popular_specs],
+    }
+
 @admin_bp.route('/admin/dashboard')
 @login_required
 @admin_required
 def dashboard():
-    # Enhanced dashboard statistics
-    total_doctors = Doctor.query.filter_by(is_available=True).count()
+    # Enhanced dashboard statistics, gathered from every branch in parallel
+    branch_stats = fan_out(_branch_dashboard_stats).values()
     total_patients = User.query.filter_by(role='patient').count()
     
-    today = datetime.now().date()
-    today_appointments = Appointment.query.filter_by(
-        appointment_date=today,
-        status='scheduled'
-    ).count()
-    
-    # Monthly stats
-    this_month = datetime.now().replace(day=1).date()
-    monthly_appointments = Appointment.query.filter(
-        Appointment.appointment_date >= this_month
-    ).count()
-    
-    # Recent appointments
-    recent_appointments = Appointment.query.order_by(
-        Appointment.created_at.desc()
-    ).limit(10).all()
+    recent_appointments = sorted(
+        (a for stats in branch_stats for a in stats['recent_appointments']),
+        key=lambda a: a.created_at, reverse=True
+    )[:10]
     
     # Popular specializations
-    popular_specs = db.session.query(
-        Doctor.specialization,
-        func.count(Appointment.id).label('count')
-    ).join(Appointment).group_by(Doctor.specialization).order_by(
-        func.count(Appointment.id).desc()
-    ).limit(5).all()
+    spec_counts = Counter()
+    for stats in branch_stats:
+        for spec, count in stats['popular_specs']:
+            spec_counts[spec] += count
     
     return render_template('admin_dashboard.html',
-                         total_doctors=total_doctors,
+                         total_doctors=sum(s['total_doctors'] for s in branch_stats),
                          total_patients=total_patients,
-                         today_appointments=today_appointments,
-                         monthly_appointments=monthly_appointments,
+                         today_appointments=sum(s['today_appointments'] for s in branch_stats),
+                         monthly_appointments=sum(s['monthly_appointments'] for s in branch_stats),
                          recent_appointments=recent_appointments,
-                         popular_specs=popular_specs)
+                         popular_specs=spec_counts.most_common(5))
 
 @admin_bp.route('/admin/doctors')
 @login_required
@@ -64,9 +83,10 @@ def manage_doctors():
     doctors = Doctor.query.all()
     return render_template('manage_doctors.html', doctors=doctors)
 
-@admin_bp.route('/admin/add_doctor', methods=['GET', 'POST'])
+@admin_bp.route('/admin/<branch>/add_doctor', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@branch_scoped
 def add_doctor():
     if request.method == 'POST':
         doctor = Doctor(
@@ -87,9 +107,10 @@ def add_doctor():
     return render_template('add_doctor.html')
 
 # NEW: Edit Doctor
-@admin_bp.route('/admin/doctor/<int:doctor_id>/edit', methods=['GET', 'POST'])
+@admin_bp.route('/admin/<branch>/doctor/<int:doctor_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@branch_scoped
 def edit_doctor(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     
@@ -109,9 +130,10 @@ def edit_doctor(doctor_id):
     return render_template('edit_doctor.html', doctor=doctor)
 
 # NEW: Delete Doctor
-@admin_bp.route('/admin/doctor/<int:doctor_id>/delete', methods=['POST'])
+@admin_bp.route('/admin/<branch>/doctor/<int:doctor_id>/delete', methods=['POST'])
 @login_required
 @admin_required
+@branch_scoped
 def delete_doctor(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     
@@ -132,9 +154,10 @@ def delete_doctor(doctor_id):
     return redirect(url_for('admin.manage_doctors'))
 
 # NEW: Doctor Schedule Management
-@admin_bp.route('/admin/doctor/<int:doctor_id>/schedule', methods=['GET', 'POST'])
+@admin_bp.route('/admin/<branch>/doctor/<int:doctor_id>/schedule', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@branch_scoped
 def manage_doctor_schedule(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     
@@ -175,21 +198,83 @@ def manage_doctor_schedule(doctor_id):
 @login_required
 @admin_required
 def view_all_appointments():
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     status_filter = request.args.get('status', 'all')
+    per_page = 20
     
-    query = Appointment.query
-    
-    if status_filter != 'all':
-        query = query.filter_by(status=status_filter)
+    def branch_appointments():
+        query = Appointment.query
+        
+        if status_filter != 'all':
+            query = query.filter_by(status=status_filter)
+        
+        # Each branch only needs its first page * per_page rows for the merge
+        items = query.options(
+            joinedload(Appointment.doctor),
+            selectinload(Appointment.patient)
+        ).order_by(
+            Appointment.appointment_date.desc(),
+            Appointment.appointment_time.desc()
+        ).limit(page * per_page).all()
+        return items, query.count()
     
-    appointments = query.order_by(
-        Appointment.appointment_date.desc(),
-        Appointment.appointment_time.desc()
-    ).paginate(
-        page=page, per_page=20, error_out=False
+    results = fan_out(branch_appointments).values()
+    merged = sorted(
+        (a for items, _ in results for a in items),
+        key=lambda a: (a.appointment_date, a.appointment_time),
+        reverse=True
+    )
+    appointments = MergedPagination(
+        page=page, per_page=per_page, error_out=False,
+        items=merged[(page - 1) * per_page:page * per_page],
+        total=sum(count for _, count in results)
     )
     
     return render_template('admin_appointments.html', 
                          appointments=appointments,
                          status_filter=status_filter)
+
+@admin_bp.route('/admin/analytics')
+@login_required
+@admin_required
+def analytics_report():
+    weeks = min(max(request.args.get('weeks', 12, type=int), 1), 104)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+
+    today = datetime.now().date()
+    end = analytics.week_start(today)
+    start = end - timedelta(weeks=weeks - 1)
+
+    def branch_report():
+        report = analytics.utilisation_report(start, end, today=today)
+
+        # Each branch's top rows are enough to find the overall top rows, and
+        # names are only looked up for doctors that can be shown
+        order = np.argsort(report['utilisation'], kind='stable')[::-1][:limit]
+        shown_ids = [int(i) for i in report['doctor_ids'][order]]
+        doctors = {d.id: d for d in Doctor.query.filter(Doctor.id.in_(shown_ids)).all()}
+        rows = [{
+            'branch': current_branch(),
+            'doctor': doctors.get(int(report['doctor_ids'][i])),
+            'offered': int(report['offered'][i]),
+            'booked': int(report['booked'][i]),
+            'cancelled': int(report['cancelled'][i]),
+            'utilisation': float(report['utilisation'][i]),
+            'cancellation_rate': float(report['cancellation_rate'][i]),
+        } for i in order]
+        return report, rows
+
+    results = fan_out(branch_report).values()
+    merged = analytics.merge_reports(report for report, _ in results)
+    doctor_rows = sorted((row for _, rows in results for row in rows),
+                         key=lambda row: row['utilisation'], reverse=True)[:limit]
+
+    return render_template('admin_analytics.html',
+                         weeks=weeks,
+                         week_rows=merged['weeks'],
+                         doctor_rows=doctor_rows,
+                         hours=[int(h) for h in merged['hours']],
+                         peak_hours=merged['peak_hours'],
+                         total_offered=merged['total_offered'],
+                         total_booked=merged['total_booked'],
+                         total_cancelled=merged['total_cancelled'])
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, db
@@ -74,3 +74,14 @@ def logout():
     logout_user()
     flash('You have been logged out successfully!', 'success')
     return redirect(url_for('auth.index'))
+
+
+@auth_bp.route('/branch/<branch>')
+@login_required
+def select_branch(branch):
+    if branch not in current_app.config['BRANCHES']:
+        flash('Unknown hospital branch!', 'error')
+    else:
+        session['branch'] = branch
+        flash(f'Switched to {branch.title()} branch.', 'success')
+    return redirect(url_for('auth.index'))
@@ -0,0 +1,32 @@
+from flask import redirect, url_for, flash, g, current_app, abort
+from functools import wraps
+
+def branch_scoped(f):
+    """Reject links and forms that were opened in a different branch.
+
+    Doctor and appointment ids are only unique within a branch, so views
+    that take one carry the branch in their URL and it must match the
+    branch the request is bound to.
+    """
+    @wraps(f)
+    def decorated_function(branch, *args, **kwargs):
+        if branch != g.branch:
+            flash(f'This page belongs to the {branch.title()} branch but you are working in '
+                  f'the {g.branch.title()} branch. Switch branches and try again.', 'error')
+            return redirect(url_for('auth.index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def branch_from_url(f):
+    """Bind the request to the branch named in the URL.
+
+    For actions on a row the user picked from a cross-branch list, where
+    the URL already says which branch the row lives in.
+    """
+    @wraps(f)
+    def decorated_function(branch, *args, **kwargs):
+        if branch not in current_app.config['BRANCHES']:
+            abort(404)
+        g.branch = branch
+        return f(*args, **kwargs)
+    return decorated_function
@@ -2,17 +2,37 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import Doctor, Appointment, DoctorSchedule, db
+from models.branch import fan_out, MergedPagination
+from .branch import branch_scoped, branch_from_url
+from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import IntegrityError
+import sqlalchemy as sa
 from datetime import datetime, timedelta
+import calendar
 
 patient_bp = Blueprint('patient', __name__)
 
+MAX_BATCH_SLOTS = 52
+MAX_RECURRENCE_INTERVAL = 12
+RECURRENCE_FREQUENCIES = ('weekly', 'monthly')
+
 @patient_bp.route('/dashboard')
 @login_required
 def dashboard():
-    upcoming_appointments = Appointment.query.filter_by(
-        patient_id=current_user.id,
-        status='scheduled'
-    ).filter(Appointment.appointment_date >= datetime.now().date()).all()
+    patient_id = current_user.id
+    today = datetime.now().date()
+    
+    # A patient can have bookings in any branch
+    def branch_upcoming():
+        return Appointment.query.options(joinedload(Appointment.doctor)).filter_by(
+            patient_id=patient_id,
+            status='scheduled'
+        ).filter(Appointment.appointment_date >= today).all()
+    
+    upcoming_appointments = sorted(
+        (a for items in fan_out(branch_upcoming).values() for a in items),
+        key=lambda a: (a.appointment_date, a.appointment_time)
+    )
     
     return render_template('patient_dashboard.html', 
                          appointments=upcoming_appointments)
@@ -23,8 +43,9 @@ def view_doctors():
     doctors = Doctor.query.filter_by(is_available=True).all()
     return render_template('doctors.html', doctors=doctors)
 
-@patient_bp.route('/book/<int:doctor_id>')
+@patient_bp.route('/<branch>/book/<int:doctor_id>')
 @login_required
+@branch_scoped
 def book_appointment(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     
@@ -79,12 +100,29 @@ def get_available_slots(doctor_id, days=30):
 @patient_bp.route('/appointment_history', methods=['GET'])
 @login_required
 def appointment_history():  # endpoint will be 'patient.appointment_history'
-    page = request.args.get('page', 1, type=int)
-    appointments = (Appointment.query
-                    .filter_by(patient_id=current_user.id)
-                    .order_by(Appointment.appointment_date.desc(),
-                              Appointment.appointment_time.desc())
-                    .paginate(page=page, per_page=10, error_out=False))
+    page = max(request.args.get('page', 1, type=int), 1)
+    patient_id = current_user.id
+    per_page = 10
+    
+    def branch_history():
+        query = Appointment.query.filter_by(patient_id=patient_id)
+        items = (query.options(joinedload(Appointment.doctor))
+                 .order_by(Appointment.appointment_date.desc(),
+                           Appointment.appointment_time.desc())
+                 .limit(page * per_page).all())
+        return items, query.count()
+    
+    results = fan_out(branch_history).values()
+    merged = sorted(
+        (a for items, _ in results for a in items),
+        key=lambda a: (a.appointment_date, a.appointment_time),
+        reverse=True
+    )
+    appointments = MergedPagination(
+        page=page, per_page=per_page, error_out=False,
+        items=merged[(page - 1) * per_page:page * per_page],
+        total=sum(count for _, count in results)
+    )
     return render_template('appointment_history.html', appointments=appointments)
 
 
@@ -134,8 +172,9 @@ def get_available_slots(doctor_id, days=30):
     return available_slots
 
 
-@patient_bp.route('/confirm_booking', methods=['POST'])
+@patient_bp.route('/<branch>/confirm_booking', methods=['POST'])
 @login_required
+@branch_scoped
 def confirm_booking():
     try:
         doctor_id = int(request.form['doctor_id'])
@@ -175,8 +214,182 @@ def confirm_booking():
         flash('An error occurred while booking the appointment. Please try again.', 'danger')
         return redirect(url_for('patient.view_doctors'))
 
-@patient_bp.route('/cancel_appointment/<int:appointment_id>', methods=['POST'])
+def expand_recurrence(start_dt, frequency='weekly', interval=1, count=1):
+    """Expand a recurrence rule into a list of slot datetimes"""
+    if frequency not in RECURRENCE_FREQUENCIES:
+        raise ValueError(f'Unknown frequency: {frequency}')
+    if interval < 1 or count < 1:
+        raise ValueError('Interval and count must be positive')
+
+    slots = []
+    for n in range(count):
+        if frequency == 'weekly':
+            slots.append(start_dt + timedelta(weeks=n * interval))
+        else:
+            # Same day of month, clamped to the last day of shorter months
+            month_index = start_dt.month - 1 + n * interval
+            year = start_dt.year + month_index // 12
+            month = month_index % 12 + 1
+            day = min(start_dt.day, calendar.monthrange(year, month)[1])
+            slots.append(start_dt.replace(year=year, month=month, day=day))
+    return slots
+
+
+def _check_batch_slots(doctor_id, schedules, slot_datetimes):
+    """Split slots into bookable ones and (datetime, reason) conflicts"""
+    dates = {dt.date() for dt in slot_datetimes}
+    taken = set()
+    if dates:
+        taken = set(db.session.query(Appointment.appointment_date,
+                                     Appointment.appointment_time)
+                    .filter(Appointment.doctor_id == doctor_id,
+                            Appointment.status == 'scheduled',
+                            Appointment.appointment_date.in_(dates))
+                    .all())
+
+    now = datetime.now()
+    bookable = []
+    conflicts = []
+    for slot_dt in sorted(slot_datetimes):
+        key = (slot_dt.date(), slot_dt.time())
+        schedule = schedules.get(slot_dt.weekday())
+
+        if slot_dt < now:
+            conflicts.append((slot_dt, 'Slot is in the past'))
+            continue
+        if not schedule or not schedule.start_time <= slot_dt.time() < schedule.end_time:
+            conflicts.append((slot_dt, 'Doctor is not available at this time'))
+            continue
+        day_start = datetime.combine(slot_dt.date(), schedule.start_time)
+        offset_minutes = (slot_dt - day_start).total_seconds() / 60
+        if offset_minutes % schedule.slot_duration:
+            conflicts.append((slot_dt, 'Time does not match a schedule slot'))
+            continue
+        if key in taken:
+            conflicts.append((slot_dt, 'Slot is already booked'))
+            continue
+
+        taken.add(key)
+        bookable.append(slot_dt)
+
+    return bookable, conflicts
+
+
+def book_slots_batch(patient_id, doctor_id, slot_datetimes, retries=3):
+    """Validate and book many slots for one doctor in a single transaction.
+
+    Schedules are loaded once and existing bookings are fetched with one
+    set-based query, so the cost stays flat as the number of slots grows.
+    The unique index on scheduled slots rejects the whole commit if a
+    concurrent booking took one of them; the batch is then re-checked and
+    retried. Returns (booked, conflicts) where conflicts is a list of
+    (datetime, reason) tuples for the slots that were not booked.
+    """
+    # Same first-match rule as get_available_slots for days with several rows
+    schedules = {}
+    for schedule in DoctorSchedule.query.filter_by(doctor_id=doctor_id).all():
+        schedules.setdefault(schedule.day_of_week, schedule)
+
+    for attempt in range(retries):
+        bookable, conflicts = _check_batch_slots(doctor_id, schedules, slot_datetimes)
+        if not bookable:
+            return [], conflicts
+
+        rows = [{
+            'patient_id': patient_id,
+            'doctor_id': doctor_id,
+            'appointment_date': slot_dt.date(),
+            'appointment_time': slot_dt.time(),
+            'status': 'scheduled'
+        } for slot_dt in bookable]
+
+        # One executemany instead of an ORM INSERT per appointment
+        try:
+            db.session.execute(sa.insert(Appointment), rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == retries - 1:
+                raise
+            continue
+
+        keys = {(slot_dt.date(), slot_dt.time()) for slot_dt in bookable}
+        booked = [a for a in Appointment.query.filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.patient_id == patient_id,
+            Appointment.status == 'scheduled',
+            Appointment.appointment_date.in_({d for d, _ in keys})
+        ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+            if (a.appointment_date, a.appointment_time) in keys]
+        return booked, conflicts
+
+
+@patient_bp.route('/<branch>/book/<int:doctor_id>/batch', methods=['GET', 'POST'])
+@login_required
+@branch_scoped
+def batch_booking(doctor_id):
+    doctor = Doctor.query.get_or_404(doctor_id)
+
+    if request.method == 'POST':
+        try:
+            if request.form.get('mode') == 'recurring':
+                start_dt = datetime.strptime(request.form['start_datetime'], '%Y-%m-%dT%H:%M')
+                interval = int(request.form.get('interval', 1))
+                count = int(request.form.get('count', 1))
+                if count > MAX_BATCH_SLOTS:
+                    flash(f'You can book at most {MAX_BATCH_SLOTS} slots at once.', 'danger')
+                    return redirect(url_for('patient.batch_booking', doctor_id=doctor_id))
+                if interval > MAX_RECURRENCE_INTERVAL:
+                    flash(f'Visits can be at most {MAX_RECURRENCE_INTERVAL} weeks or months apart.', 'danger')
+                    return redirect(url_for('patient.batch_booking', doctor_id=doctor_id))
+                slot_datetimes = expand_recurrence(
+                    start_dt,
+                    frequency=request.form.get('frequency', 'weekly'),
+                    interval=interval,
+                    count=count
+                )
+            else:
+                slot_datetimes = [datetime.strptime(value, '%Y-%m-%d %H:%M')
+                                  for value in request.form.getlist('appointment_datetime')]
+        except (KeyError, ValueError, OverflowError):
+            flash('Invalid booking details. Please check the form and try again.', 'danger')
+            return redirect(url_for('patient.batch_booking', doctor_id=doctor_id))
+
+        if not slot_datetimes:
+            flash('Please select at least one slot.', 'warning')
+            return redirect(url_for('patient.batch_booking', doctor_id=doctor_id))
+        if len(slot_datetimes) > MAX_BATCH_SLOTS:
+            flash(f'You can book at most {MAX_BATCH_SLOTS} slots at once.', 'danger')
+            return redirect(url_for('patient.batch_booking', doctor_id=doctor_id))
+
+        try:
+            booked, conflicts = book_slots_batch(current_user.id, doctor_id, slot_datetimes)
+        except Exception:
+            db.session.rollback()
+            flash('An error occurred while booking the appointments. Please try again.', 'danger')
+            return redirect(url_for('patient.batch_booking', doctor_id=doctor_id))
+
+        if booked:
+            flash(f'{len(booked)} appointment(s) booked successfully!', 'success')
+        if conflicts:
+            flash(f'{len(conflicts)} slot(s) could not be booked.', 'warning')
+
+        return render_template('batch_booking.html',
+                               doctor=doctor,
+                               slots=[],
+                               booked=booked,
+                               conflicts=conflicts)
+
+    available_slots = get_available_slots(doctor_id, days=30)
+    return render_template('batch_booking.html',
+                           doctor=doctor,
+                           slots=available_slots,
+                           booked=[],
+                           conflicts=[])
+
+@patient_bp.route('/<branch>/cancel_appointment/<int:appointment_id>', methods=['POST'])
 @login_required
+@branch_from_url
 def cancel_appointment(appointment_id):
     # cancel logic yahan likhoge
     appointment = Appointment.query.get_or_404(appointment_id)